@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Collects concurrent inference requests and runs them through a batched
+    function on a single dedicated GPU thread.
+
+    The worker takes the first queued item, then keeps collecting until either
+    `max_batch_size` items are gathered or `max_wait_ms` has elapsed, calls
+    `batch_fn(items)` once and hands each result back to its caller's future.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: int = 50,
+        name: str = "batch-scheduler"
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[tuple[Any, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Enqueue an item and return a future for its result."""
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def infer_sync(self, item: Any) -> Any:
+        """Blocking call for worker threads (e.g. run_in_executor callers)."""
+        return self.submit(item).result()
+
+    async def infer(self, item: Any) -> Any:
+        """Awaitable call for coroutines."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Mark futures as running; callers cancelled while queued are dropped
+        return [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                logger.error(f"[{self.name}] Batch of {len(items)} failed: {e}")
+                for _, future in batch:
+                    self._resolve(future, exception=e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                self._resolve(future, result=result)
+
+    def _resolve(self, future: Future, result: Any = None, exception: Exception = None):
+        # A future can still be cancelled through asyncio.wrap_future after it
+        # started running; that must never take the worker thread down
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except Exception as e:
+            logger.warning(f"[{self.name}] Could not deliver result: {e}")
@@ -1,14 +1,40 @@
 import os
+import functools
+
+# Persist compiled Inductor kernels so cold starts reuse them
+os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.expanduser("~/.cache/vietforeign/inductor"))
+
 import torch
+import librosa
+import numpy as np
+import soundfile as sf
 import tempfile
 import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
 from TTS.tts.configs.xtts_config import XttsConfig
 from TTS.tts.models.xtts import Xtts
 from TTS.api import TTS
+from transformers.pytorch_utils import Conv1D
+
+try:
+    from torchao.quantization import quantize_, int8_weight_only
+except ImportError:
+    quantize_ = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Max number of reference speakers whose conditioning latents / waveforms are kept in memory
+LATENT_CACHE_SIZE = 64
+
+# Share of GPU memory the caching allocator may reserve for this process
+GPU_MEMORY_FRACTION = float(os.getenv("GPU_MEMORY_FRACTION", "0.92"))
+
+# Short bundled clip used to warm up (compile) the XTTS decoder
+WARMUP_REFERENCE_AUDIO = Path(__file__).resolve().parent.parent / "data" / "sample-3s.wav"
+
 class VoiceSynthesisService:
     # Language mapping for XTTS-v2 supported languages (limited to English, Japanese, French)
     SUPPORTED_LANGUAGES = {
@@ -21,29 +47,40 @@ class VoiceSynthesisService:
         'french': 'fr',
         'français': 'fr'  # French with accent
     }
+    # Keys tried longest-first for partial matches, computed once
+    _LANG_KEYS_BY_LEN = sorted(SUPPORTED_LANGUAGES, key=len, reverse=True)
 
     def __init__(
         self,
         xtts_model_dir: str = "./model",              
-        voice_conversion_model: str = "voice_conversion_models/multilingual/multi-dataset/openvoice_v2"
+        voice_conversion_model: str = "voice_conversion_models/multilingual/multi-dataset/openvoice_v2",
+        int8_gpt: bool = True,
+        compile_gpt: bool = True
     ):
         self.model_dir = xtts_model_dir
         self.voice_conversion_model = voice_conversion_model  # Fixed: Store the parameter
+        self.int8_gpt = int8_gpt
+        self.compile_gpt = compile_gpt
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.xtts_model: Xtts = None
         self.vc_model: TTS = None
+        # LRU of (path, mtime, gpt_cond_len, max_ref_len) -> (gpt_cond_latent, speaker_embedding)
+        self._latent_cache: OrderedDict = OrderedDict()
+        self._latent_cache_lock = threading.Lock()
+        # LRU of (path, mtime) -> reference waveform at the VC model's input rate; guarded by _vc_lock
+        self._ref_wav_cache: OrderedDict = OrderedDict()
+        # Separate locks for the XTTS and voice-conversion stages so one request's
+        # VC + disk write overlaps the next request's XTTS inference
+        self._xtts_lock = threading.Lock()
+        self._vc_lock = threading.Lock()
 
-        print(f"🚀 Initializing VoiceSynthesisService...")
-        print(f"📁 XTTS model directory: {self.model_dir}")
-        print(f"🎤 Voice conversion model: {self.voice_conversion_model}")
-        print(f"💻 Device: {self.device}")
+        logger.info("Initializing VoiceSynthesisService on %s", self.device)
 
         # Load both models up‐front:
         self._load_xtts_model()
         self._load_voice_conversion_model()
 
     def _load_xtts_model(self):
-        print(f"📥 Loading XTTS model from {self.model_dir}...")
         logger.info("Loading XTTS model from %s", self.model_dir)
         
         try:
@@ -61,47 +98,172 @@ class VoiceSynthesisService:
             
             if torch.cuda.is_available():
                 self.xtts_model.cuda()
-                print("🔥 XTTS model loaded on CUDA")
+                logger.info("XTTS model loaded on CUDA")
+                if self.int8_gpt:
+                    self._quantize_gpt_int8()
+                if self.compile_gpt:
+                    # In-place compile keeps the references held by XTTS's inference wrapper valid.
+                    # No CUDA graphs: XTTS's GPT-2 decode grows its KV cache every step and has no
+                    # fixed-size cache, so reduce-overhead would record a new graph per length.
+                    self.xtts_model.gpt.gpt.compile(mode="default", fullgraph=False, dynamic=True)
+                    logger.info("XTTS GPT backbone compiled with torch.compile")
             else:
-                print("💻 XTTS model loaded on CPU")
+                logger.info("XTTS model loaded on CPU")
                 
         except Exception as e:
-            print(f"❌ Failed to load XTTS model: {e}")
             logger.error(f"Failed to load XTTS model: {e}")
             raise
 
+    def _quantize_gpt_int8(self):
+        """
+        INT8 weight-only quantization of the XTTS GPT transformer blocks.
+        Output heads and the vocoder stay in full precision.
+        """
+        if quantize_ is None:
+            logger.warning("torchao not installed, skipping INT8 quantization of XTTS GPT")
+            return
+
+        backbone = self.xtts_model.gpt.gpt
+        # HF GPT-2 uses Conv1D (transposed weights); torchao only rewrites nn.Linear
+        for parent in list(backbone.modules()):
+            for name, child in parent.named_children():
+                if isinstance(child, Conv1D):
+                    in_features, out_features = child.weight.shape
+                    linear = torch.nn.Linear(
+                        in_features, out_features,
+                        device=child.weight.device, dtype=child.weight.dtype,
+                    )
+                    linear.weight.data = child.weight.data.t().contiguous()
+                    linear.bias.data = child.bias.data
+                    setattr(parent, name, linear)
+
+        quantize_(backbone, int8_weight_only())
+        logger.info("XTTS GPT backbone quantized to INT8 weight-only")
+
     def _load_voice_conversion_model(self):
-        print(f"📥 Loading voice conversion model...")
         logger.info("Loading voice conversion model: %s", self.voice_conversion_model)
         
         try:
             self.vc_model = TTS(self.voice_conversion_model).to(self.device)
-            print("✅ Voice conversion model loaded successfully")
+            logger.info("Voice conversion model loaded")
         except Exception as e:
-            print(f"❌ Failed to load voice conversion model: {e}")
             logger.error(f"Failed to load voice conversion model: {e}")
             raise
 
-    def _normalize_language_code(self, language: str) -> str:
+    def warmup(self):
+        """
+        Run one short inference so torch.compile traces and compiles the GPT
+        backbone at load time instead of on the first request. This also
+        primes the CUDA caching allocator's pool at inference shapes.
+        """
+        # Nothing is compiled on CPU or with compile_gpt off
+        if self.device != "cuda" or not self.compile_gpt:
+            return
+
+        if not WARMUP_REFERENCE_AUDIO.exists():
+            logger.warning("Warmup reference audio not found: %s", WARMUP_REFERENCE_AUDIO)
+            return
+
+        logger.info("Warming up XTTS inference...")
+        try:
+            with self._xtts_lock:
+                gpt_cond_latent, speaker_embedding = self.xtts_model.get_conditioning_latents(
+                    audio_path=str(WARMUP_REFERENCE_AUDIO),
+                    gpt_cond_len=self.xtts_model.config.gpt_cond_len,
+                    max_ref_length=self.xtts_model.config.max_ref_len,
+                    sound_norm_refs=self.xtts_model.config.sound_norm_refs,
+                )
+                self.xtts_model.inference(
+                    text="Hello, this is a warmup.",
+                    language="en",
+                    gpt_cond_latent=gpt_cond_latent,
+                    speaker_embedding=speaker_embedding,
+                )
+            logger.info(
+                "XTTS warmup complete (%.0f MiB reserved)",
+                torch.cuda.memory_reserved() / (1 << 20)
+            )
+        except Exception as e:
+            logger.warning(f"XTTS warmup failed: {e}")
+
+    def _get_conditioning_latents(self, reference_audio_path: str):
+        """
+        Return (gpt_cond_latent, speaker_embedding) for a reference clip, reusing
+        cached latents while the file is unchanged.
+        """
+        config = self.xtts_model.config
+        key = (
+            str(reference_audio_path),
+            os.path.getmtime(reference_audio_path),
+            config.gpt_cond_len,
+            config.max_ref_len,
+        )
+
+        with self._latent_cache_lock:
+            latents = self._latent_cache.get(key)
+            if latents is not None:
+                self._latent_cache.move_to_end(key)
+                logger.info("Reusing cached conditioning latents for %s", reference_audio_path)
+                return latents
+
+        latents = self.xtts_model.get_conditioning_latents(
+            audio_path=reference_audio_path,
+            gpt_cond_len=config.gpt_cond_len,
+            max_ref_length=config.max_ref_len,
+            sound_norm_refs=config.sound_norm_refs,
+        )
+
+        with self._latent_cache_lock:
+            self._latent_cache[key] = latents
+            if len(self._latent_cache) > LATENT_CACHE_SIZE:
+                self._latent_cache.popitem(last=False)
+        return latents
+
+    def _get_reference_wav(self, reference_audio_path: str) -> np.ndarray:
+        """
+        Return the reference clip decoded at the voice-conversion model's input
+        sample rate, reusing the decoded array while the file is unchanged.
+        Must be called with _vc_lock held.
+        """
+        key = (str(reference_audio_path), os.path.getmtime(reference_audio_path))
+        wav = self._ref_wav_cache.get(key)
+        if wav is not None:
+            self._ref_wav_cache.move_to_end(key)
+            return wav
+
+        sample_rate = self.vc_model.voice_converter.vc_config.audio.input_sample_rate
+        wav, _ = librosa.load(str(reference_audio_path), sr=sample_rate)
+        self._ref_wav_cache[key] = wav
+        if len(self._ref_wav_cache) > LATENT_CACHE_SIZE:
+            self._ref_wav_cache.popitem(last=False)
+        return wav
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _normalize_language_code(language: str) -> str:
         """
         Normalize language input to supported XTTS language codes.
         """
-        if not language:
+        language_lower = (language or "").lower().strip()
+        if not language_lower:
             return "en"  # Default to English
         
-        language_lower = language.lower().strip()
-        
-        # Direct lookup in supported languages
-        if language_lower in self.SUPPORTED_LANGUAGES:
-            return self.SUPPORTED_LANGUAGES[language_lower]
-        
-        # Try to match partial language names
-        for key, value in self.SUPPORTED_LANGUAGES.items():
-            if language_lower.startswith(key) or key.startswith(language_lower):
-                return value
+        supported = VoiceSynthesisService.SUPPORTED_LANGUAGES
         
-        logger.warning(f"Language '{language}' not supported, defaulting to English")
-        return "en"
+        # Direct lookup, then partial language names
+        code = supported.get(language_lower)
+        if code is None:
+            code = next(
+                (
+                    supported[key] for key in VoiceSynthesisService._LANG_KEYS_BY_LEN
+                    if language_lower.startswith(key) or key.startswith(language_lower)
+                ),
+                None
+            )
+        if code is None:
+            logger.warning(f"Language '{language}' not supported, defaulting to English")
+            return "en"
+        return code
 
     def get_supported_languages(self) -> list:
         """Return list of supported language codes."""
@@ -125,90 +287,100 @@ class VoiceSynthesisService:
             output_path: Output path for synthesized audio
             language: Target language for synthesis
         """
-        print(f"\n{'='*60}")
-        print(f"🎤 VOICE SYNTHESIS REQUEST")
-        print(f"{'='*60}")
-        print(f"📝 Text: '{text}'")
-        print(f"🎯 Language: {language}")
-        print(f"🔊 Reference audio: {reference_audio_path}")
-        print(f"💾 Output path: {output_path}")
-        
         # Normalize language code
         normalized_language = self._normalize_language_code(language)
-        print(f"🔧 Using normalized language code: {normalized_language}")
+        logger.debug("Normalized language %r -> %s", language, normalized_language)
 
         try:
             # 1) Latent extraction for this specific audio
-            print("🧠 Computing conditioning latents...")
             logger.info("Computing conditioning latents for %s", reference_audio_path)
             
             if not os.path.exists(reference_audio_path):
                 raise FileNotFoundError(f"Reference audio file not found: {reference_audio_path}")
             
-            gpt_cond_latent, speaker_embedding = self.xtts_model.get_conditioning_latents(
-                audio_path=reference_audio_path,
-                gpt_cond_len=self.xtts_model.config.gpt_cond_len,
-                max_ref_length=self.xtts_model.config.max_ref_len,
-                sound_norm_refs=self.xtts_model.config.sound_norm_refs,
-            )
+            with self._xtts_lock:
+                gpt_cond_latent, speaker_embedding = self._get_conditioning_latents(reference_audio_path)
 
-            # 2) TTS inference with specified language
-            print(f"🤖 Running XTTS inference...")
-            logger.info("Running XTTS inference for text: %r in language: %s", text, normalized_language)
-            out_wav = self.xtts_model.inference(
-                text=text,
-                language=normalized_language,  # Use the normalized language code
-                gpt_cond_latent=gpt_cond_latent,
-                speaker_embedding=speaker_embedding,
-                temperature=0.3,
-                length_penalty=1.0,
-                repetition_penalty=10.0,
-                top_k=30,
-                top_p=0.85,
-            )
+                # 2) TTS inference with specified language
+                logger.info("Running XTTS inference for text: %r in language: %s", text, normalized_language)
+                out_wav = self.xtts_model.inference(
+                    text=text,
+                    language=normalized_language,  # Use the normalized language code
+                    gpt_cond_latent=gpt_cond_latent,
+                    speaker_embedding=speaker_embedding,
+                    temperature=0.3,
+                    length_penalty=1.0,
+                    repetition_penalty=10.0,
+                    top_k=30,
+                    top_p=0.85,
+                )
 
             # 3) Voice conversion
-            print(f"🔄 Applying voice conversion...")
             logger.info("Applying voice conversion to file: %s", output_path)
             
             # Ensure output directory exists
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-            self.vc_model.voice_conversion_to_file(
-                source_wav=out_wav["wav"],
-                target_wav=reference_audio_path,
-                speaker="MySpeaker",
-                file_path=output_path,
-            )
+            with self._vc_lock:
+                converted_wav = self.vc_model.voice_conversion(
+                    source_wav=out_wav["wav"],
+                    target_wav=self._get_reference_wav(reference_audio_path),
+                    speaker="MySpeaker",
+                )
+                output_sample_rate = self.vc_model.voice_converter.vc_config.audio.output_sample_rate
+
+            # Peak-normalize to full-scale int16, as coqui's save_wav does for voice_conversion_to_file
+            wav = np.asarray(converted_wav, dtype=np.float32)
+            wav_int16 = (wav * (32767 / max(0.01, float(np.max(np.abs(wav)))))).astype(np.int16)
+
+            # Write beside the target and rename, so the file is never served half-written
+            tmp_path = f"{output_path}.part"
+            try:
+                sf.write(tmp_path, wav_int16, output_sample_rate, format="WAV", subtype="PCM_16")
+                os.replace(tmp_path, output_path)
+            except Exception:
+                # Don't leave a half-written file behind in static/converted
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
 
-            print(f"✅ VOICE SYNTHESIS COMPLETED!")
-            print(f"💾 Output saved to: {output_path}")
-            print(f"{'='*60}\n")
-            
             logger.info("Synthesis complete—saved to %s", output_path)
             return output_path
             
         except Exception as e:
-            print(f"❌ Voice synthesis failed: {e}")
             logger.error(f"Voice synthesis failed: {e}")
             raise
 
 
+def _cap_gpu_memory() -> None:
+    """Cap this process's share of GPU memory and drop load-time fragments."""
+    torch.cuda.set_per_process_memory_fraction(GPU_MEMORY_FRACTION)
+    torch.cuda.empty_cache()
+    logger.info(
+        "GPU memory pool capped at %.0f%% of device memory",
+        GPU_MEMORY_FRACTION * 100
+    )
+
+
 # Singleton accessor
 _voice_synthesis_service: VoiceSynthesisService = None
+_voice_synthesis_service_lock = threading.Lock()
 
 def get_voice_synthesis_service() -> VoiceSynthesisService:
     global _voice_synthesis_service
     if _voice_synthesis_service is None:
-        print("🚀 Initializing VoiceSynthesisService singleton...")
-        logger.info("Initializing VoiceSynthesisService singleton")
-        try:
-            _voice_synthesis_service = VoiceSynthesisService()
-            print("✅ VoiceSynthesisService singleton ready!")
-        except Exception as e:
-            print(f"❌ Failed to initialize VoiceSynthesisService: {e}")
-            logger.error(f"Failed to initialize VoiceSynthesisService: {e}")
-            raise
-    else:
-        print("♻️ Using existing VoiceSynthesisService singleton")
+        # Worker threads may race on the first request; load the models only once
+        with _voice_synthesis_service_lock:
+            if _voice_synthesis_service is None:
+                logger.info("Initializing VoiceSynthesisService singleton")
+                try:
+                    service = VoiceSynthesisService()
+                    if torch.cuda.is_available():
+                        _cap_gpu_memory()
+                    # Also fills the caching allocator's pool at inference shapes
+                    service.warmup()
+                    _voice_synthesis_service = service
+                    logger.info("VoiceSynthesisService singleton ready")
+                except Exception as e:
+                    logger.error(f"Failed to initialize VoiceSynthesisService: {e}")
+                    raise
     return _voice_synthesis_service
\ No newline at end of file
@@ -1,9 +1,17 @@
-from transformers import pipeline
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+import torch
+import os
 import logging
+import threading
+from ai_service.batch_scheduler import BatchScheduler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+NLLB_MODEL = "facebook/nllb-200-distilled-600M"
+# Optional pre-quantized FP8 (W8A8) NLLB checkpoint, used only on GPUs with FP8 tensor cores
+NLLB_FP8_MODEL = os.getenv("NLLB_FP8_MODEL")
+
 class TranslatorService:
     def __init__(self):
         self.supported_languages = {
@@ -11,14 +19,41 @@ class TranslatorService:
             "ja": "jpn_Jpan",
             "fr": "fra_Latn"
         }
-        self.translator = pipeline(
-            "translation",
-            model="facebook/nllb-200-distilled-600M",
-            device_map="auto"
-        )
+        # BF16 weights halve memory traffic in the decode loop; CPU stays FP32
+        self.dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+        self.model_name = self._select_model()
+        logger.info(f"🔧 Loading translation model: {self.model_name}")
         self.src_lang = "vie_Latn"
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, src_lang=self.src_lang)
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(
+            self.model_name,
+            device_map="auto",
+            torch_dtype=self.dtype
+        )
+        self.model.eval()
+        # forced_bos_token_id per NLLB target code, resolved once
+        self._bos_cache = {
+            code: self.tokenizer.convert_tokens_to_ids(code)
+            for code in self.supported_languages.values()
+        }
+        # Concurrent translations share batched generate() calls
+        self._scheduler = BatchScheduler(
+            self._translate_batch, max_batch_size=8, max_wait_ms=50, name="translate-batch"
+        )
         logger.info("✅ TranslatorService initialized successfully")
 
+    def _select_model(self) -> str:
+        """
+        Pick the FP8 checkpoint when one is configured and the GPU supports FP8
+        (compute capability >= 8.9), otherwise fall back to the BF16 base model.
+        """
+        if not NLLB_FP8_MODEL:
+            return NLLB_MODEL
+        if torch.cuda.is_available() and torch.cuda.get_device_capability() >= (8, 9):
+            return NLLB_FP8_MODEL
+        logger.warning("⚠️ FP8 translation model requires compute capability >= 8.9, using BF16")
+        return NLLB_MODEL
+
     def translate(self, text: str, target_lang: str) -> str:
         """
         Translate Vietnamese text to target language.
@@ -44,15 +79,7 @@ class TranslatorService:
 
         try:
             logger.info("🤖 Calling translation model...")
-            result = self.translator(
-                text,
-                src_lang=self.src_lang,
-                tgt_lang=tgt_lang
-            )
-            
-            logger.info(f"📊 Raw model result: {result}")
-            
-            translated_text = result[0]["translation_text"]
+            translated_text = self._scheduler.infer_sync((text, tgt_lang))
             
             logger.info(f"✅ Translation successful!")
             logger.info(f"📤 Original (Vietnamese): '{text}'")
@@ -66,21 +93,77 @@ class TranslatorService:
             logger.error(f"🔍 Error type: {type(e).__name__}")
             raise
 
+    def translate_many(self, texts: list[str], target_langs: list[str]) -> list[str]:
+        """
+        Translate many Vietnamese texts at once; the scheduler batches them into
+        one forward pass per target language.
+
+        Args:
+            texts (list[str]): Vietnamese texts to translate.
+            target_langs (list[str]): Target language for each text, each one of ['en', 'ja', 'fr'].
+
+        Returns:
+            list[str]: Translated texts, in input order.
+        """
+        if len(texts) != len(target_langs):
+            raise ValueError("texts and target_langs must have the same length")
+
+        unsupported = set(target_langs) - self.supported_languages.keys()
+        if unsupported:
+            error_msg = f"Unsupported target language(s) {sorted(unsupported)}. Choose from: {list(self.supported_languages.keys())}"
+            logger.error(f"❌ {error_msg}")
+            raise ValueError(error_msg)
+
+        # Go through the scheduler so generate() only ever runs on its thread
+        futures = [
+            self._scheduler.submit((text, self.supported_languages[lang]))
+            for text, lang in zip(texts, target_langs)
+        ]
+        return [future.result() for future in futures]
+
+    def _translate_batch(self, items: list) -> list:
+        """Translate (text, tgt_lang) pairs with one tokenize + generate() per target language."""
+        results = [None] * len(items)
+        groups = {}
+        for i, (text, tgt_lang) in enumerate(items):
+            groups.setdefault(tgt_lang, []).append(i)
+
+        for tgt_lang, indices in groups.items():
+            batch = self.tokenizer(
+                [items[i][0] for i in indices],
+                padding="longest",
+                truncation=True,
+                return_tensors="pt"
+            ).to(self.model.device)
+            with torch.no_grad():
+                output_ids = self.model.generate(
+                    **batch,
+                    forced_bos_token_id=self._bos_cache[tgt_lang],
+                    num_beams=1,
+                    max_new_tokens=256,
+                    use_cache=True
+                )
+            outputs = self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+            for i, output in zip(indices, outputs):
+                results[i] = output
+        return results
 
 # Global instance
 translation_service = None
+_translation_service_lock = threading.Lock()
 
 
 def get_translation_service():
     global translation_service
     if translation_service is None:
-        logger.info("🚀 Initializing TranslationService...")
-        try:
-            translation_service = TranslatorService()
-            logger.info("✅ TranslationService ready for use")
-        except Exception as e:
-            logger.error(f"❌ Failed to initialize translation service: {e}")
-            raise
-    else:
-        logger.info("♻️ Using existing TranslationService instance")
+        # Worker threads may race on the first request; load the model only once
+        with _translation_service_lock:
+            if translation_service is None:
+                logger.info("🚀 Initializing TranslationService...")
+                try:
+                    translation_service = TranslatorService()
+                    logger.info("✅ TranslationService ready for use")
+                except Exception as e:
+                    logger.error(f"❌ Failed to initialize translation service: {e}")
+                    raise
     return translation_service
\ No newline at end of file
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
-from utils import get_audio_file, save_audio_in_memory_and_disk, check_audio_format
+from utils import audio_storage, get_audio_file, save_audio_in_memory_and_disk, check_audio_format
 from dependencies import UnsupportedFileFormatException
 import logging
 
@@ -12,28 +12,31 @@ async def upload_audio(file: UploadFile = File(...)):
     """Upload audio file"""
     try:
         # Check format first
-        print(f"→ Received upload: filename={file.filename!r}, content_type={file.content_type!r}")
-        await check_audio_format(file.filename or "")
+        logger.debug("Received upload: filename=%r, content_type=%r", file.filename, file.content_type)
+        check_audio_format(file.filename or "")
         
-        # Read file content once
-        contents = await file.read()
+        # Stream to disk and register in memory
+        audio_id = await save_audio_in_memory_and_disk(file)
+        file_path = audio_storage[audio_id]["file_path"]
+        size = file_path.stat().st_size
         
         # Validate content is not empty
-        if len(contents) == 0:
+        if size == 0:
+            audio_storage.pop(audio_id, None)
+            file_path.unlink(missing_ok=True)
             raise HTTPException(status_code=400, detail="Empty file uploaded")
         
-        # Save to both memory and disk
-        audio_id = await save_audio_in_memory_and_disk(file, contents)
-        
         return {
             "id": audio_id,
             "filename": file.filename,
             "message": "Audio uploaded successfully",
-            "size": len(contents)
+            "size": size
         }
         
     except UnsupportedFileFormatException as e:
         raise HTTPException(status_code=415, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
@@ -44,11 +47,9 @@ async def upload_audio(file: UploadFile = File(...)):
 @router.get("/audios/{id}/conversions/{lang}")
 async def download_audio(id: str):
     try:
-        audio = await get_audio_file(id)
+        await get_audio_file(id)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Audio file not found")
-    finally:
-        audio.file.close()
 
     return {
         "id": id,
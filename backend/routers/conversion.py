@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
+import uuid
 import tempfile
 import logging
 import asyncio
 import functools
-from utils import get_audio_file, get_audio_storage, get_transcript_storage
+from concurrent.futures import ThreadPoolExecutor
+from utils import audio_storage, get_audio_file, transcript_storage
 from dependencies import get_translation_service, get_voice_synthesis_service
 
 # Setup logging
@@ -14,6 +16,10 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Output directory for converted audio, created once per process
+CONVERTED_DIR = "static/converted"
+os.makedirs(CONVERTED_DIR, exist_ok=True)
+
 # Pydantic models for the combined conversion endpoint
 class ConversionRequest(BaseModel):
     des_lang: str  # Match frontend parameter name
@@ -45,40 +51,38 @@ class VoiceConversionResponse(BaseModel):
     synthesized_text: str
     message: str
 
-# Decorator to offload blocking functions
-def run_in_thread(func):
-    @functools.wraps(func)
-    async def wrapper(*args, **kwargs):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
-    return wrapper
+# Dedicated executors per workload so GPU synthesis never queues behind
+# translation or FastAPI's default-pool work. The default of two concurrent
+# syntheses lets one request's voice conversion overlap the next request's
+# XTTS inference; the semaphore bounds how many requests hold GPU memory at once.
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "2"))
+TTS_POOL = ThreadPoolExecutor(max_workers=TTS_CONCURRENCY, thread_name_prefix="tts")
+TTS_SEM = asyncio.Semaphore(TTS_CONCURRENCY)
+TRANSLATE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="translate")
+
+async def _run(pool: ThreadPoolExecutor, fn, *args, **kwargs):
+    """Run a blocking function on the given executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
 
 # Core synchronous functions
 def translate_sync(vietnamese_text: str, target_lang: str) -> str:
     translation_service = get_translation_service()
     return translation_service.translate(vietnamese_text, target_lang)
 
-@run_in_thread
 def synthesize_voice(audio_path: str, text: str, language: str = "en") -> str:
     """
     Synthesize text into voice using the provided reference audio.
     """
     voice_service = get_voice_synthesis_service()
-    logger.info(f"🎤 Voice service initialized")
-    logger.info(f"📝 Synthesizing text: '{text}' in language: {language}")
-    logger.info(f"🔊 Reference audio: {audio_path}")
+    logger.debug("📝 Synthesizing text: %r in language: %s, reference audio: %s", text, language, audio_path)
 
-    # Create static directory for converted audio
-    static_dir = "static/converted"
-    os.makedirs(static_dir, exist_ok=True)
-    
     # Generate unique filename
-    import uuid
     filename = f"converted_{uuid.uuid4().hex[:8]}_{language}.wav"
     # Use forward slashes for URL consistency
-    output_path = os.path.join(static_dir, filename).replace("\\", "/")
+    output_path = os.path.join(CONVERTED_DIR, filename).replace("\\", "/")
     
-    logger.info(f"💾 Output path: {output_path}")
+    logger.debug("💾 Output path: %s", output_path)
     
     try:
         # Call the synthesize method with all required parameters
@@ -92,16 +96,15 @@ def synthesize_voice(audio_path: str, text: str, language: str = "en") -> str:
         # Normalize the result path
         result_path = result_path.replace("\\", "/")
         
-        logger.info(f"✅ Voice synthesis completed: {result_path}")
+        logger.debug("✅ Voice synthesis completed: %s", result_path)
         
-        # Verify file exists
-        if not os.path.exists(result_path):
+        # Verify the file exists and get its size with a single stat
+        try:
+            file_size = os.stat(result_path).st_size
+        except FileNotFoundError:
             logger.error(f"❌ Synthesized file not found at: {result_path}")
             raise FileNotFoundError(f"Synthesized audio file not created: {result_path}")
-        
-        # Get file size for verification
-        file_size = os.path.getsize(result_path)
-        logger.info(f"📁 File size: {file_size} bytes")
+        logger.debug("📁 File size: %d bytes", file_size)
         
         return result_path
         
@@ -110,48 +113,36 @@ def synthesize_voice(audio_path: str, text: str, language: str = "en") -> str:
         logger.error(f"❌ Error type: {type(e).__name__}")
         raise
 
-# Wrap sync functions
-translate_in_thread = run_in_thread(translate_sync)
-
 @router.post("/audios/{id}/translate", response_model=TranslationResponse)
 async def translate_text_only(id: str, request: TranslateRequest):
     """Translate stored transcript to target language only"""
-    logger.info(f"🎯 Translation request received for ID: {id}")
-    logger.info(f"🌍 Target language: {request.target_language}")
+    logger.debug("🎯 Translation request for ID: %s, target language: %s", id, request.target_language)
     
-    transcripts = get_transcript_storage()
-    if id not in transcripts:
+    entry = transcript_storage.get(id)
+    if entry is None:
         logger.error(f"❌ Transcript not found for ID: {id}")
         raise HTTPException(status_code=404, detail="Transcript not found")
 
-    vietnamese_text = transcripts[id].get("corrected_transcript") or transcripts[id].get("raw_transcript", "")
+    vietnamese_text = entry.get("corrected_transcript") or entry.get("raw_transcript", "")
     if not vietnamese_text:
         logger.error(f"❌ No transcript available for ID: {id}")
         raise HTTPException(status_code=400, detail="No transcript to translate")
 
-    logger.info(f"📝 Vietnamese text to translate: '{vietnamese_text}'")
-    logger.info(f"📏 Text length: {len(vietnamese_text)} characters")
+    logger.debug("📝 Vietnamese text to translate (%d chars): %r", len(vietnamese_text), vietnamese_text)
 
     try:
-        logger.info("🔄 Starting translation process...")
-        translated = await translate_in_thread(vietnamese_text, request.target_language)
+        translated = await _run(TRANSLATE_POOL, translate_sync, vietnamese_text, request.target_language)
         
-        logger.info(f"✅ Translation completed successfully!")
-        logger.info(f"📤 Original: '{vietnamese_text}'")
-        logger.info(f"📥 Translated: '{translated}'")
+        logger.debug("📥 Translated: %r", translated)
         
         # Store translated text
-        transcripts[id]["translated_transcript"] = translated
-        logger.info(f"💾 Stored translated text in transcript storage")
+        entry["translated_transcript"] = translated
 
-        response = TranslationResponse(
+        return TranslationResponse(
             id=id,
             translated_text=translated,
             message="Translation successful"
         )
-        
-        logger.info(f"📡 Sending response: {response.dict()}")
-        return response
     except Exception as e:
         logger.error(f"Translation failed: {e}")
         raise HTTPException(status_code=500, detail="Translation failed")
@@ -159,14 +150,13 @@ async def translate_text_only(id: str, request: TranslateRequest):
 @router.post("/audios/{id}/voice-conversion", response_model=VoiceConversionResponse)
 async def convert_voice_with_language(id: str, request: VoiceConversionRequest):
     """Convert voice using the stored translated text or custom text with language support"""
-    logger.info(f"🎤 Voice conversion request received for ID: {id}")
-    logger.info(f"🌍 Target language: {request.target_language}")
-    logger.info(f"📝 Custom text provided: {bool(request.text)}")
-    
-    transcripts = get_transcript_storage()
-    audio_storage = get_audio_storage()
+    logger.debug(
+        "🎤 Voice conversion request for ID: %s, target language: %s, custom text: %s",
+        id, request.target_language, bool(request.text)
+    )
     
-    if id not in transcripts:
+    entry = transcript_storage.get(id)
+    if entry is None:
         logger.error(f"❌ Transcript not found for ID: {id}")
         raise HTTPException(status_code=404, detail="Transcript not found")
     if id not in audio_storage:
@@ -178,20 +168,20 @@ async def convert_voice_with_language(id: str, request: VoiceConversionRequest):
     
     if request.text:
         text_to_synthesize = request.text
-        logger.info(f"Using custom text for synthesis: '{text_to_synthesize}'")
+        logger.debug("Using custom text for synthesis: %r", text_to_synthesize)
     else:
         # Try to get translated text first
-        translated_text = transcripts[id].get("translated_transcript")
+        translated_text = entry.get("translated_transcript")
         if translated_text:
             text_to_synthesize = translated_text
-            logger.info(f"Using stored translated text: '{text_to_synthesize}'")
+            logger.debug("Using stored translated text: %r", text_to_synthesize)
         else:
             # Fallback to original transcript
             text_to_synthesize = (
-                transcripts[id].get("corrected_transcript") or 
-                transcripts[id].get("raw_transcript", "")
+                entry.get("corrected_transcript") or 
+                entry.get("raw_transcript", "")
             )
-            logger.info(f"Using original transcript as fallback: '{text_to_synthesize}'")
+            logger.debug("Using original transcript as fallback: %r", text_to_synthesize)
 
     if not text_to_synthesize:
         logger.error(f"❌ No text available for synthesis")
@@ -200,45 +190,35 @@ async def convert_voice_with_language(id: str, request: VoiceConversionRequest):
             detail="No text available for synthesis. Please provide text or translate first."
         )
 
-    logger.info(f"🎤 Synthesizing text: '{text_to_synthesize}' in language: {request.target_language}")
-
     try:
         # Get original audio file
         audio_path = await get_audio_file(id)
-        logger.info(f"📁 Using audio file: {audio_path}")
+        logger.debug("📁 Using audio file: %s", audio_path)
         
         # Synthesize voice with translated text and target language
-        synth_path = await synthesize_voice(
-            audio_path=audio_path, 
-            text=text_to_synthesize,
-            language=request.target_language
-        )
-        
-        if not os.path.exists(synth_path):
-            logger.error(f"❌ Synthesized audio not found at: {synth_path}")
-            raise HTTPException(status_code=500, detail="Synthesized audio not found")
+        async with TTS_SEM:
+            synth_path = await _run(
+                TTS_POOL,
+                synthesize_voice,
+                audio_path=audio_path, 
+                text=text_to_synthesize,
+                language=request.target_language
+            )
 
+        # synthesize_voice has already stat'ed the output file
         # Create a URL for the converted audio - normalize path separators
         relative_path = synth_path.replace("static/", "").replace("\\", "/")
         converted_audio_url = f"/static/{relative_path}"
-        logger.info(f"🔗 Converted audio URL: {converted_audio_url}")
-        
-        # Verify the file is accessible
-        file_size = os.path.getsize(synth_path)
-        logger.info(f"📊 Final file verification - Size: {file_size} bytes, Path: {synth_path}")
+        logger.debug("🔗 Converted audio URL: %s", converted_audio_url)
         
         # Store synthesis info
-        if "voice_conversions" not in transcripts[id]:
-            transcripts[id]["voice_conversions"] = {}
-        transcripts[id]["voice_conversions"][request.target_language] = {
+        entry.setdefault("voice_conversions", {})[request.target_language] = {
             "audio_path": synth_path,
             "text": text_to_synthesize,
             "audio_url": converted_audio_url
         }
 
-        logger.info(f"✅ Voice conversion completed successfully!")
-        
-        response = VoiceConversionResponse(
+        return VoiceConversionResponse(
             id=id,
             converted_audio_url=converted_audio_url,
             audio_file_path=synth_path,
@@ -247,9 +227,6 @@ async def convert_voice_with_language(id: str, request: VoiceConversionRequest):
             message="Voice conversion successful"
         )
         
-        logger.info(f"📡 Sending response: {response.dict()}")
-        return response
-        
     except FileNotFoundError as e:
         logger.error(f"❌ Audio file not found: {e}")
         raise HTTPException(status_code=404, detail="Audio file not found on disk")
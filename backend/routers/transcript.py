@@ -5,13 +5,14 @@ from typing import Optional
 import logging
 from utils import (
     get_audio_file, 
-    get_audio_storage, 
-    get_transcript_storage,
+    audio_storage,
+    transcript_storage,
     is_vietnamese_transcript  
 )
 from dependencies import get_transcript_service
 import asyncio
 import functools
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -26,14 +27,15 @@ class TranscriptResponse(BaseModel):
     status: str
     message: str
 
-def run_in_thread(func):
-    @functools.wraps(func)
-    async def wrapper(*args, **kwargs):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, func, *args, **kwargs)
-    return wrapper
+# Dedicated executor for transcription; sized so concurrent requests can be
+# fused by the ASR batch scheduler
+TRANSCRIBE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="transcribe")
+
+async def _run(pool: ThreadPoolExecutor, fn, *args, **kwargs):
+    """Run a blocking function on the given executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
 
-@run_in_thread
 def process_audio_sync(audio_path: str) -> dict:
     try:
         service = get_transcript_service()
@@ -47,16 +49,19 @@ def process_audio_sync(audio_path: str) -> dict:
 @router.get("/audios/{id}/transcript")
 async def get_transcript(id: str):
     try:
-        audio_storage = get_audio_storage()
-        transcript_storage = get_transcript_storage()
-        
         # Return cached transcript if exists
         if id in transcript_storage:
             stored = transcript_storage[id]
-            # Re-check language for cached transcripts
+            # Check language for cached transcripts once, then reuse the stored result
             corrected_transcript = stored.get("corrected_transcript", "")
             if corrected_transcript:
-                is_vn, detected_lang = await is_vietnamese_transcript(corrected_transcript)
+                if "lang_ok" in stored:
+                    is_vn, detected_lang = stored["lang_ok"], stored["detected_lang"]
+                else:
+                    is_vn, detected_lang = await is_vietnamese_transcript(corrected_transcript)
+                    # A failed detection is retried on the next request instead of being cached
+                    if detected_lang != "detection_failed":
+                        stored["lang_ok"], stored["detected_lang"] = is_vn, detected_lang
                 if not is_vn:
                     raise HTTPException(
                         status_code=400, 
@@ -81,7 +86,7 @@ async def get_transcript(id: str):
             raise HTTPException(status_code=404, detail="Audio file not found")
         
         # Process audio
-        result = await process_audio_sync(str(audio_file_path))
+        result = await _run(TRANSCRIBE_POOL, process_audio_sync, str(audio_file_path))
         
         # Handle language error
         if result["status"] == "language_error":
@@ -114,9 +119,6 @@ async def get_transcript(id: str):
 @router.put("/audios/{id}/transcript")
 async def update_transcript(id: str, request: TranscriptUpdateRequest):
     try:
-        audio_storage = get_audio_storage()
-        transcript_storage = get_transcript_storage()
-        
         if id not in audio_storage:
             raise HTTPException(status_code=404, detail="Audio not found")
         
@@ -138,7 +140,9 @@ async def update_transcript(id: str, request: TranscriptUpdateRequest):
         
         transcript_storage[id].update({
             "corrected_transcript": new_transcript,
-            "status": "updated"
+            "status": "updated",
+            "lang_ok": True,
+            "detected_lang": detected_lang
         })
         
         return TranscriptResponse(
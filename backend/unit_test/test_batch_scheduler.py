@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ai_service.batch_scheduler import BatchScheduler
+
+
+class BatchSchedulerTest(unittest.TestCase):
+    def test_batches_concurrent_items(self):
+        batches = []
+
+        def batch_fn(items):
+            batches.append(list(items))
+            return [item * 2 for item in items]
+
+        scheduler = BatchScheduler(batch_fn, max_batch_size=4, max_wait_ms=100)
+        futures = [scheduler.submit(i) for i in range(4)]
+
+        self.assertEqual([f.result(timeout=1) for f in futures], [0, 2, 4, 6])
+        self.assertEqual(batches, [[0, 1, 2, 3]])
+
+    def test_batch_error_reaches_every_caller(self):
+        def batch_fn(items):
+            raise ValueError("boom")
+
+        scheduler = BatchScheduler(batch_fn, max_wait_ms=10)
+        future = scheduler.submit(1)
+
+        with self.assertRaises(ValueError):
+            future.result(timeout=1)
+
+    def test_short_result_list_fails_batch(self):
+        scheduler = BatchScheduler(lambda items: items[:1], max_batch_size=2, max_wait_ms=100)
+        futures = [scheduler.submit(i) for i in range(2)]
+
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=1)
+        self.assertEqual(scheduler.submit(5).result(timeout=1), 5)
+
+    def test_cancelled_caller_does_not_stop_worker(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def batch_fn(items):
+            started.set()
+            release.wait(timeout=1)
+            return items
+
+        scheduler = BatchScheduler(batch_fn, max_wait_ms=1)
+
+        async def cancel_while_running():
+            task = asyncio.ensure_future(scheduler.infer(1))
+            await asyncio.to_thread(started.wait, 1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_while_running())
+        release.set()
+
+        self.assertEqual(scheduler.submit(5).result(timeout=1), 5)
+
+    def test_cancelled_while_queued_is_skipped(self):
+        seen = []
+        release = threading.Event()
+
+        def batch_fn(items):
+            seen.extend(items)
+            release.wait(timeout=1)
+            return items
+
+        scheduler = BatchScheduler(batch_fn, max_batch_size=1, max_wait_ms=1)
+        first = scheduler.submit(1)
+        queued = scheduler.submit(2)
+        queued.cancel()
+        release.set()
+
+        self.assertEqual(first.result(timeout=1), 1)
+        self.assertEqual(scheduler.submit(3).result(timeout=1), 3)
+        self.assertNotIn(2, seen)
+
+
+if __name__ == "__main__":
+    unittest.main()
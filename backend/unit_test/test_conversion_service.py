@@ -0,0 +1,31 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ai_service.conversion_service import VoiceSynthesisService
+
+
+class NormalizeLanguageCodeTest(unittest.TestCase):
+    def test_direct_codes_and_names(self):
+        normalize = VoiceSynthesisService._normalize_language_code
+        self.assertEqual(normalize("en"), "en")
+        self.assertEqual(normalize(" French "), "fr")
+        self.assertEqual(normalize("Français"), "fr")
+        self.assertEqual(normalize("JP"), "ja")
+
+    def test_partial_names(self):
+        normalize = VoiceSynthesisService._normalize_language_code
+        self.assertEqual(normalize("japan"), "ja")
+        self.assertEqual(normalize("english-us"), "en")
+
+    def test_unknown_or_empty_defaults_to_english(self):
+        normalize = VoiceSynthesisService._normalize_language_code
+        self.assertEqual(normalize(""), "en")
+        self.assertEqual(normalize(" "), "en")
+        self.assertEqual(normalize("vietnamese"), "en")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ai_service.batch_scheduler import BatchScheduler
+from ai_service.translation_service import TranslatorService
+
+
+class _FakeBatch(dict):
+    def to(self, device):
+        return self
+
+
+class _FakeTokenizer:
+    def __call__(self, texts, **kwargs):
+        return _FakeBatch(texts=list(texts))
+
+    def batch_decode(self, output_ids, skip_special_tokens=True):
+        return list(output_ids)
+
+
+class _FakeModel:
+    device = "cpu"
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, texts, forced_bos_token_id, **kwargs):
+        self.calls.append((forced_bos_token_id, threading.current_thread().name))
+        return [f"{forced_bos_token_id}:{text}" for text in texts]
+
+
+def _make_service() -> TranslatorService:
+    # Skip __init__ so no model weights are loaded
+    service = TranslatorService.__new__(TranslatorService)
+    service.supported_languages = {"en": "eng_Latn", "ja": "jpn_Jpan", "fr": "fra_Latn"}
+    service.tokenizer = _FakeTokenizer()
+    service.model = _FakeModel()
+    service._bos_cache = {code: code for code in service.supported_languages.values()}
+    service._scheduler = BatchScheduler(
+        service._translate_batch, max_batch_size=8, max_wait_ms=50, name="translate-batch"
+    )
+    return service
+
+
+class TranslateManyTest(unittest.TestCase):
+    def test_keeps_input_order_across_languages(self):
+        service = _make_service()
+        texts = ["một", "hai", "ba", "bốn"]
+        langs = ["en", "ja", "en", "fr"]
+
+        self.assertEqual(
+            service.translate_many(texts, langs),
+            ["eng_Latn:một", "jpn_Jpan:hai", "eng_Latn:ba", "fra_Latn:bốn"]
+        )
+
+    def test_generate_runs_on_scheduler_thread(self):
+        service = _make_service()
+        service.translate_many(["một", "hai"], ["en", "fr"])
+
+        self.assertTrue(service.model.calls)
+        self.assertTrue(all(name == "translate-batch" for _, name in service.model.calls))
+
+    def test_rejects_unsupported_language(self):
+        service = _make_service()
+        with self.assertRaises(ValueError):
+            service.translate_many(["một"], ["de"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import tempfile
+import unicodedata
+import unittest
+from pathlib import Path
+
+from utils import AudioStorage, has_vietnamese_chars
+
+
+class HasVietnameseCharsTest(unittest.TestCase):
+    def test_vietnamese_text(self):
+        self.assertTrue(has_vietnamese_chars("Xin chào, tôi là người Việt Nam."))
+
+    def test_decomposed_vietnamese_text(self):
+        # NFD input (base letter + combining marks) is normalised before checking
+        text = unicodedata.normalize("NFD", "Hôm nay trời đẹp quá.")
+        self.assertTrue(has_vietnamese_chars(text))
+
+    def test_english_and_french_text(self):
+        self.assertFalse(has_vietnamese_chars("Hello, how are you today?"))
+        self.assertFalse(has_vietnamese_chars("Je suis très content de vous voir."))
+
+    def test_no_letters(self):
+        self.assertFalse(has_vietnamese_chars(""))
+        self.assertFalse(has_vietnamese_chars("12345 !?"))
+
+
+class AudioStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.now = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _audio_file(self, name: str) -> str:
+        path = Path(self.tmp_dir.name) / name
+        path.write_bytes(b"audio")
+        return str(path)
+
+    def test_lru_eviction_removes_file(self):
+        storage = AudioStorage(maxsize=1, ttl=60, timer=lambda: self.now)
+        first = self._audio_file("first.wav")
+        storage["first"] = {"file_path": first}
+        storage["second"] = {"file_path": self._audio_file("second.wav")}
+
+        self.assertNotIn("first", storage)
+        self.assertFalse(Path(first).exists())
+
+    def test_expiry_removes_file(self):
+        storage = AudioStorage(maxsize=8, ttl=60, timer=lambda: self.now)
+        path = self._audio_file("clip.wav")
+        storage["clip"] = {"file_path": path}
+
+        self.now = 61
+        storage.expire()
+
+        self.assertNotIn("clip", storage)
+        self.assertFalse(Path(path).exists())
+
+    def test_eviction_on_event_loop_removes_file(self):
+        storage = AudioStorage(maxsize=1, ttl=60, timer=lambda: self.now)
+        first = self._audio_file("first.wav")
+
+        async def upload():
+            storage["first"] = {"file_path": first}
+            storage["second"] = {"file_path": self._audio_file("second.wav")}
+
+        # asyncio.run waits for the default executor, where the unlink runs
+        asyncio.run(upload())
+
+        self.assertNotIn("first", storage)
+        self.assertFalse(Path(first).exists())
+
+    def test_entry_without_file_is_evicted(self):
+        storage = AudioStorage(maxsize=1, ttl=60, timer=lambda: self.now)
+        storage["first"] = {}
+        storage["second"] = {"file_path": str(Path(self.tmp_dir.name) / "missing.wav")}
+        storage["third"] = {}
+
+        self.assertEqual(list(storage), ["third"])
+
+
+if __name__ == "__main__":
+    unittest.main()
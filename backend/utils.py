@@ -1,10 +1,14 @@
 import uuid
+import asyncio
+import shutil
 from fastapi import UploadFile
 from pathlib import Path
 import logging
 import tempfile
+import unicodedata
 from dependencies import UnsupportedFileFormatException, UnsupportedLanguageException
 from fast_langdetect import detect
+from cachetools import TTLCache
 from typing import Dict, Tuple
 from datetime import datetime
 
@@ -16,31 +20,69 @@ ALLOWED_EXTS = {'.wav', '.mp3', '.m4a', '.flac', '.ogg', '.aac', '.webm'}
 MAX_DURATION = 60.0  
 SUPPORTED_LANGUAGES = {"en", "fr", "ja"}
 
+# Language detection only needs a prefix of the text
+LANG_DETECT_SAMPLE_CHARS = 256
+# Letters used by Vietnamese but not by French/English: ă đ ơ ư and the
+# tone-marked vowels of the Latin Extended Additional block (U+1EA0-U+1EF9)
+VIETNAMESE_CHARS = frozenset("ăđơư" + "".join(chr(c) for c in range(0x1EA0, 0x1EFA)))
+VIETNAMESE_CHECK_CHARS = 200
+VIETNAMESE_CHAR_RATIO = 0.05
 
-audio_storage: Dict[str, dict] = {}
-transcript_storage: Dict[str, dict] = {}
 
-# Create temp directory for audio files
-TEMP_AUDIO_DIR = Path(tempfile.gettempdir()) / "audio_uploads"
-TEMP_AUDIO_DIR.mkdir(exist_ok=True)
+STORAGE_TTL = 3600  # seconds
+
+
+class AudioStorage(TTLCache):
+    """
+    TTL/LRU-bounded audio storage that deletes an upload's temp file when its entry is dropped.
+
+    Under load, an entry can be evicted while a request still needs its file: a
+    request that looks the audio up afterwards gets a 404, and one already reading
+    the file can fail mid-decode.
+    """
+
+    def popitem(self):
+        key, value = super().popitem()
+        _remove_audio_file(value)
+        return key, value
+
+    def expire(self, time=None):
+        expired = super().expire(time) or []
+        for _, value in expired:
+            _remove_audio_file(value)
+        return expired
+
+
+def _remove_audio_file(audio_data: dict):
+    file_path = audio_data.get("file_path")
+    if not file_path:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _unlink_audio_file(file_path)
+    else:
+        # Eviction runs inside TTLCache.__setitem__ on the event loop; unlink off it
+        loop.run_in_executor(None, _unlink_audio_file, file_path)
+
+
+def _unlink_audio_file(file_path):
+    try:
+        Path(file_path).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"Could not remove evicted audio file {file_path}: {e}")
 
-def get_audio_storage():
-    """Get the shared audio storage"""
-    return audio_storage
 
-def get_transcript_storage():
-    """Get the shared transcript storage"""
-    return transcript_storage
+audio_storage: Dict[str, dict] = AudioStorage(maxsize=1024, ttl=STORAGE_TTL)
+transcript_storage: Dict[str, dict] = TTLCache(maxsize=2048, ttl=STORAGE_TTL)
 
-def get_temp_audio_dir():
-    """Get the temporary audio directory"""
-    return TEMP_AUDIO_DIR
+# Create temp directory for audio files
+TEMP_AUDIO_DIR = Path(tempfile.gettempdir()) / "audio_uploads"
+TEMP_AUDIO_DIR.mkdir(exist_ok=True)
 
 
 async def get_audio_file(audio_id: str) -> Path:
     """Get audio file path for processing"""
-    audio_storage = get_audio_storage()
-    
     if audio_id not in audio_storage:
         logger.error(f"Audio ID {audio_id} not found in storage")
         logger.error(f"Available IDs: {list(audio_storage.keys())}")
@@ -64,33 +106,33 @@ async def generate_audio_id() -> str:
     """Generate a unique audio ID"""
     return str(uuid.uuid4())
 
-async def check_audio_format(filename: str):
+def check_audio_format(filename: str):
     """Check if the audio format is supported based on filename"""
-    supported_formats = ['.wav', '.mp3', '.m4a', '.flac', '.ogg', '.aac', '.webm']
-    if not any(filename.lower().endswith(fmt) for fmt in supported_formats):
+    if Path(filename).suffix.lower() not in ALLOWED_EXTS:
         raise UnsupportedFileFormatException(
-            f"Unsupported file format. Supported formats: {', '.join(supported_formats)}"
+            f"Unsupported file format. Supported formats: {', '.join(sorted(ALLOWED_EXTS))}"
         )
 
-async def save_audio_in_memory_and_disk(audio: UploadFile, contents: bytes) -> str:
-    """Save the uploaded audio file both in memory and to disk"""
+async def save_audio_in_memory_and_disk(audio: UploadFile) -> str:
+    """Stream the uploaded audio file to disk and register it in memory"""
     audio_id = await generate_audio_id()
-    audio_storage = get_audio_storage()
-    temp_dir = get_temp_audio_dir()
-    
     # Create temporary file path
     file_extension = Path(audio.filename or "audio.wav").suffix
-    temp_file_path = temp_dir / f"{audio_id}{file_extension}"
+    temp_file_path = TEMP_AUDIO_DIR / f"{audio_id}{file_extension}"
     
-    # Write to disk for transcript processing
-    with open(temp_file_path, "wb") as f:
-        f.write(contents)
+    # Stream to disk for transcript processing in 1 MiB chunks
+    await audio.seek(0)
+
+    def write_to_disk():
+        with open(temp_file_path, "wb", buffering=1 << 20) as f:
+            shutil.copyfileobj(audio.file, f, length=1 << 20)
+
+    await asyncio.to_thread(write_to_disk)
     
     # Store in shared memory storage
     audio_storage[audio_id] = {
         "id": audio_id,
         "filename": audio.filename,
-        "content": contents,
         "content_type": audio.content_type,
         "file_path": temp_file_path,
         "upload_time": datetime.now()
@@ -106,8 +148,6 @@ async def get_transcript(id: str) -> str:
     """
     Get the transcript for the given audio ID
     """
-    transcript_storage = get_transcript_storage()
-    
     if id not in transcript_storage:
         logger.error(f"Transcript ID {id} not found in storage")
         logger.error(f"Available transcript IDs: {list(transcript_storage.keys())}")
@@ -129,6 +169,15 @@ async def get_transcript(id: str) -> str:
     logger.info(f"Found transcript for ID {id}")
     return transcript_text
 
+def has_vietnamese_chars(text: str) -> bool:
+    """Cheap check for Vietnamese-only letters in the start of the text"""
+    head = unicodedata.normalize("NFC", text[:VIETNAMESE_CHECK_CHARS].lower())
+    letters = sum(1 for ch in head if ch.isalpha())
+    if not letters:
+        return False
+    vietnamese = sum(1 for ch in head if ch in VIETNAMESE_CHARS)
+    return vietnamese / letters >= VIETNAMESE_CHAR_RATIO
+
 async def is_vietnamese_transcript(transcript: str) -> tuple[bool, str]:
     """
     Check if transcript is in Vietnamese
@@ -142,8 +191,13 @@ async def is_vietnamese_transcript(transcript: str) -> tuple[bool, str]:
     if not transcript or len(transcript.strip()) < 10:
         return False, "text_too_short"
     
+    sample = transcript.strip()[:LANG_DETECT_SAMPLE_CHARS]
+    if has_vietnamese_chars(sample):
+        return True, "VI"
+    
     try:
-        detected_lang = detect(transcript.strip())
+        # fastText inference is CPU-bound; keep it off the event loop
+        detected_lang = await asyncio.to_thread(detect, sample)
         is_vietnamese = detected_lang in ['VI', 'VIE']
         
         logger.info(f"Language detection: {detected_lang}, is_vietnamese: {is_vietnamese}")